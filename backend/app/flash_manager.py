@@ -1,4 +1,6 @@
+import functools
 import logging
+import os
 import re
 import subprocess
 import time
@@ -7,6 +9,32 @@ from typing import Optional
 
 logger = logging.getLogger(__name__)
 
+_FAMILY_RE = re.compile(r"EFR32[A-Z]{2}\d{2}", re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=16)
+def _target_family(target: str) -> Optional[str]:
+    """Family prefix of a target name, e.g. 'EFR32FG28B322F1024IM48' -> 'EFR32FG28'.
+
+    Targets come from a tiny fixed set, so the regex runs once per distinct
+    name for the life of the process.
+    """
+    match = _FAMILY_RE.search(target)
+    return match.group(0).upper() if match else None
+
+
+def _scan_packs(pack_dir: Path) -> list[str]:
+    """Pack filenames in *pack_dir*, sorted.
+
+    A plain scandir + suffix check: cheaper than Path.glob, which compiles an
+    fnmatch regex and allocates a Path per entry.
+    """
+    try:
+        with os.scandir(pack_dir) as it:
+            return sorted(e.name for e in it if e.name.endswith(".pack"))
+    except OSError:
+        return []
+
 
 class FlashManager:
     """Manages firmware flashing to DAP targets via pyocd."""
@@ -23,33 +51,44 @@ class FlashManager:
         self.pack_dir.mkdir(parents=True, exist_ok=True)
         self.target = target
         self.frequency = frequency
+        self._pack_cache: dict[str, Optional[str]] = {}
+        self._pack_dir_mtime: int = -1
 
     def _find_pack(self, target: str) -> Optional[str]:
         """Find a .pack file that matches the target family name.
 
         E.g. target='EFR32FG28B322F1024IM48' -> finds pack with 'EFR32FG28' in name.
+        Results are cached per target and invalidated when the pack directory
+        changes (uploads touch its mtime).
         """
         if not self.pack_dir.exists():
             return None
 
-        packs = list(self.pack_dir.glob("*.pack"))
-        if not packs:
-            return None
-
-        match = re.search(r"EFR32[A-Z]{2}\d{2}", target, re.IGNORECASE)
-        if match:
-            family = match.group(0).upper()
-            for p in packs:
-                if family in p.name.upper():
-                    return str(p)
-
-        return str(sorted(packs)[0])
+        cur_mtime = self.pack_dir.stat().st_mtime_ns
+        if cur_mtime != self._pack_dir_mtime:
+            self._pack_cache.clear()
+            self._pack_dir_mtime = cur_mtime
+        elif target in self._pack_cache:
+            return self._pack_cache[target]
+
+        result = None
+        packs = _scan_packs(self.pack_dir)
+        if packs:
+            family = _target_family(target)
+            if family:
+                for name in packs:
+                    if family in name.upper():
+                        result = str(self.pack_dir / name)
+                        break
+            if result is None:
+                result = str(self.pack_dir / packs[0])
+
+        self._pack_cache[target] = result
+        return result
 
     def list_packs(self) -> list[str]:
         """List available .pack files."""
-        if self.pack_dir.exists():
-            return [f.name for f in sorted(self.pack_dir.glob("*.pack"))]
-        return []
+        return _scan_packs(self.pack_dir)
 
     def flash(
         self,
@@ -0,0 +1,165 @@
+import os
+import struct
+import tempfile
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+
+# Byte offset of every INDEX_STRIDE-th line is recorded in the sidecar.
+INDEX_STRIDE = 1024
+
+_MAGIC = b"RLI2"
+_HEADER = struct.Struct("<4sIQQ")  # magic, stride, indexed_bytes, total_lines
+
+
+class LogIndex:
+    """Sparse line-offset index for an append-only daily log file.
+
+    Stored as a ``<date>.log.idx`` sidecar next to the log: a small header
+    followed by a packed ``array('Q')`` with the byte offset of every
+    ``INDEX_STRIDE``-th line and a parallel ``array('I')`` with that line's
+    millisecond-of-day timestamp. Because daily logs only grow, the index is
+    extended incrementally from the last indexed byte when the file has been
+    appended to; it is rebuilt from scratch only if the file shrank (i.e.
+    was replaced).
+    """
+
+    def __init__(self, stride: int, indexed_bytes: int, total_lines: int,
+                 offsets: array, timestamps: array):
+        self.stride = stride
+        self.indexed_bytes = indexed_bytes
+        self.total_lines = total_lines
+        self.offsets = offsets
+        self.timestamps = timestamps
+
+    @staticmethod
+    def _idx_path(log_path: Path) -> Path:
+        return log_path.with_name(log_path.name + ".idx")
+
+    @classmethod
+    def load(cls, log_path: Path) -> "LogIndex":
+        """Load the sidecar for *log_path*, extending or rebuilding as needed."""
+        idx_path = cls._idx_path(log_path)
+        size = log_path.stat().st_size
+        idx = None
+        try:
+            idx = cls._read(idx_path)
+        except OSError:
+            pass
+        if idx is not None and idx.stride == INDEX_STRIDE and idx.indexed_bytes <= size:
+            if idx.indexed_bytes == size:
+                return idx
+            return cls._extend(log_path, idx_path, idx)
+        return cls._build(log_path, idx_path)
+
+    @staticmethod
+    def _line_ms(line: bytes) -> int:
+        """Millisecond-of-day of a '[YYYY-MM-DDTHH:MM:SS.mmm]'-prefixed line."""
+        if len(line) > 24 and line[0] == 0x5B and line[24] == 0x5D:
+            try:
+                return (
+                    (int(line[12:14]) * 60 + int(line[15:17])) * 60
+                    + int(line[18:20])
+                ) * 1000 + int(line[21:24])
+            except ValueError:
+                pass
+        return 0
+
+    @classmethod
+    def _read(cls, idx_path: Path) -> "LogIndex | None":
+        with open(idx_path, "rb") as fh:
+            header = fh.read(_HEADER.size)
+            if len(header) != _HEADER.size:
+                return None
+            magic, stride, indexed_bytes, total_lines = _HEADER.unpack(header)
+            if magic != _MAGIC:
+                return None
+            body = fh.read()
+        entries = len(body) // 12  # 8 bytes offset + 4 bytes timestamp
+        offsets = array("Q")
+        offsets.frombytes(body[: entries * 8])
+        timestamps = array("I")
+        timestamps.frombytes(body[entries * 8 : entries * 12])
+        return cls(stride, indexed_bytes, total_lines, offsets, timestamps)
+
+    @classmethod
+    def _scan(cls, log_path: Path, start: int, total_lines: int, last_ms: int,
+              offsets: array, timestamps: array) -> tuple[int, int]:
+        """Index complete lines from byte *start* on.
+
+        Returns (new end offset, new total line count).
+
+        Stops at the last newline so a partially written tail line is picked
+        up by the next extension instead of being miscounted now.
+        """
+        pos = start
+        with open(log_path, "rb", buffering=1 << 20) as fh:
+            if start:
+                fh.seek(start)
+            for line in fh:
+                if not line.endswith(b"\n"):
+                    break
+                if total_lines % INDEX_STRIDE == 0:
+                    ms = cls._line_ms(line) or last_ms
+                    offsets.append(pos)
+                    timestamps.append(ms)
+                    last_ms = ms
+                total_lines += 1
+                pos += len(line)
+        return pos, total_lines
+
+    @classmethod
+    def _build(cls, log_path: Path, idx_path: Path) -> "LogIndex":
+        offsets = array("Q")
+        timestamps = array("I")
+        pos, total_lines = cls._scan(log_path, 0, 0, 0, offsets, timestamps)
+        idx = cls(INDEX_STRIDE, pos, total_lines, offsets, timestamps)
+        idx._save(idx_path)
+        return idx
+
+    @classmethod
+    def _extend(cls, log_path: Path, idx_path: Path, idx: "LogIndex") -> "LogIndex":
+        last_ms = idx.timestamps[-1] if idx.timestamps else 0
+        pos, total_lines = cls._scan(
+            log_path, idx.indexed_bytes, idx.total_lines, last_ms,
+            idx.offsets, idx.timestamps,
+        )
+        idx.indexed_bytes = pos
+        idx.total_lines = total_lines
+        idx._save(idx_path)
+        return idx
+
+    def _save(self, idx_path: Path):
+        # Unique temp name per writer: concurrent requests can rebuild the
+        # same index from Starlette's thread pool, and a shared tmp file
+        # would interleave their writes before the atomic replace.
+        try:
+            fd, tmp = tempfile.mkstemp(
+                prefix=idx_path.name + ".", suffix=".tmp", dir=idx_path.parent
+            )
+            try:
+                with os.fdopen(fd, "wb") as fh:
+                    fh.write(_HEADER.pack(_MAGIC, self.stride, self.indexed_bytes,
+                                          self.total_lines))
+                    fh.write(self.offsets.tobytes())
+                    fh.write(self.timestamps.tobytes())
+                os.replace(tmp, idx_path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        except OSError:
+            pass  # read-only log dir: the in-memory index still works
+
+    def seek_line(self, line_no: int) -> tuple[int, int]:
+        """Return (byte_offset, lines_still_to_skip) to reach *line_no*."""
+        if not self.offsets or line_no <= 0:
+            return 0, max(line_no, 0)
+        slot = min(line_no // self.stride, len(self.offsets) - 1)
+        return self.offsets[slot], line_no - slot * self.stride
+
+    def seek_time(self, ms_of_day: int) -> int:
+        """Byte offset of a line at or before *ms_of_day* (a safe scan start)."""
+        if not self.timestamps:
+            return 0
+        slot = max(bisect_left(self.timestamps, ms_of_day) - 1, 0)
+        return self.offsets[slot]
@@ -1,16 +1,23 @@
 import asyncio
+import functools
+import mmap
 import os
 import re
+import tempfile
+import threading
+from collections import deque
 from contextlib import asynccontextmanager
 from datetime import date, datetime
 from pathlib import Path
 from typing import Optional
 
+import orjson
 from fastapi import FastAPI, File, Form, Query, UploadFile, WebSocket, WebSocketDisconnect
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 
 from flash_manager import FlashManager
+from log_index import LogIndex
 from serial_manager import SerialManager
 
 LOG_DIR = os.getenv("LOG_DIR", "/app/logs")
@@ -19,8 +26,7 @@ PACK_DIR = os.getenv("PACK_DIR", "/app/packs")
 PYOCD_TARGET = os.getenv("PYOCD_TARGET", "EFR32FG28B322F1024IM48")
 PYOCD_FREQ = os.getenv("PYOCD_FREQ", "20M")
 
-ANSI_RE = re.compile(r"\x1b\[[0-9;]*m")
-TS_RE = re.compile(r"^\[(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d{3})\]")
+ANSI_RE_B = re.compile(rb"\x1b\[[0-9;]*m")
 
 manager = SerialManager(log_dir=LOG_DIR, baud_rate=BAUD_RATE)
 flash_mgr = FlashManager(
@@ -38,7 +44,13 @@ async def lifespan(app: FastAPI):
     manager.stop()
 
 
-app = FastAPI(title="Radxa Serial Logger & Flasher", lifespan=lifespan)
+app = FastAPI(
+    title="Radxa Serial Logger & Flasher",
+    lifespan=lifespan,
+    # orjson is already a dependency (NDJSON streaming); use it for the
+    # regular JSON endpoints too instead of stdlib json.dumps.
+    default_response_class=ORJSONResponse,
+)
 
 
 # --- REST API ---
@@ -49,43 +61,153 @@ async def list_ports():
     return manager.get_ports_info()
 
 
+@functools.lru_cache(maxsize=4096)
+def _parse_log_stem(stem: str) -> Optional[date]:
+    """Parse a 'YYYY-MM-DD' log stem to a date, or None for foreign names.
+
+    Memoized: the same stems recur on every request, so after warm-up each
+    directory entry costs one dict hit instead of a parse.
+    """
+    if stem[4] != "-" or stem[7] != "-":
+        return None
+    try:
+        return date(int(stem[:4]), int(stem[5:7]), int(stem[8:10]))
+    except ValueError:
+        return None
+
+
+def _list_log_dates(port_dir: Path) -> list[tuple[date, Path]]:
+    """List daily log files as (date, path) sorted by date.
+
+    Uses os.scandir with a shape check on the 'YYYY-MM-DD.log' name instead
+    of glob + date.fromisoformat: one readdir pass, no per-entry stat and no
+    exception-driven filtering.
+    """
+    result: list[tuple[date, Path]] = []
+    try:
+        with os.scandir(port_dir) as it:
+            for e in it:
+                name = e.name
+                if len(name) == 14 and name.endswith(".log"):
+                    d = _parse_log_stem(name[:10])
+                    if d is not None:
+                        result.append((d, Path(e.path)))
+    except OSError:
+        return []
+    result.sort(key=lambda item: item[0])
+    return result
+
+
 @app.get("/api/logs/{port_id}/dates")
 async def available_dates(port_id: str):
     port_dir = Path(LOG_DIR) / port_id
-    if not port_dir.exists():
-        return {"dates": []}
-    dates = []
-    for f in sorted(port_dir.glob("*.log")):
-        try:
-            date.fromisoformat(f.stem)
-            dates.append(f.stem)
-        except ValueError:
-            continue
-    return {"dates": dates}
+    # scandir on slow media can block; keep it off the event loop
+    listed = await asyncio.to_thread(_list_log_dates, port_dir)
+    return {"dates": [d.isoformat() for d, _ in listed]}
+
+
+# Reverse-read granularity for _tail_lines; 64 KiB sits on the syscall-cost
+# plateau for sequential reads on this class of storage.
+TAIL_BLOCK = 65536
+
+# WebSocket buffer depth at which the oldest entries start being coalesced
+# into single batched frames instead of dropped (slow-client backpressure).
+WS_COALESCE_AT = 4000
 
 
 def _tail_lines(filepath: Path, n: int) -> list[str]:
     """Read last *n* lines from a file without loading it entirely."""
-    if not filepath.exists() or filepath.stat().st_size == 0:
+    try:
+        fd = os.open(filepath, os.O_RDONLY)
+    except OSError:
         return []
-    lines: list[str] = []
-    block_size = 8192
-    with open(filepath, "rb") as f:
-        f.seek(0, 2)
-        remaining = f.tell()
-        while remaining > 0 and len(lines) <= n:
-            read_size = min(block_size, remaining)
-            remaining -= read_size
-            f.seek(remaining)
-            block = f.read(read_size)
-            lines = block.decode("utf-8", errors="replace").splitlines() + lines
-    return lines[-n:]
-
-
-def _extract_timestamp(line: str) -> Optional[str]:
-    """Extract the ISO timestamp from a log line, e.g. '2026-02-17T16:48:38.784'."""
-    m = TS_RE.match(line)
-    return m.group(1) if m else None
+    try:
+        size = os.fstat(fd).st_size
+        if size == 0:
+            return []
+        # Pull fixed blocks from the end with pread, counting newlines per
+        # block until n lines are covered; decode the collected tail once.
+        blocks: deque = deque()
+        nl_count = 0
+        pos = size
+        while pos > 0 and nl_count <= n:
+            read_len = min(TAIL_BLOCK, pos)
+            pos -= read_len
+            block = os.pread(fd, read_len, pos)
+            blocks.appendleft(block)
+            nl_count += block.count(b"\n")
+        return b"".join(blocks).decode("utf-8", errors="replace").splitlines()[-n:]
+    finally:
+        os.close(fd)
+
+
+def _iter_raw_lines(buf, start: int = 0):
+    """Yield the lines of *buf* (mmap or bytes), splitting 1 MiB blocks.
+
+    One C-level split per block instead of a find + slice per line; a line
+    straddling two blocks is stitched back together before being yielded.
+    """
+    size = len(buf)
+    pos = start
+    partial = b""
+    while pos < size:
+        block = buf[pos : pos + (1 << 20)]
+        pos += len(block)
+        if partial:
+            block = partial + block
+        parts = block.split(b"\n")
+        partial = parts.pop()
+        yield from parts
+    if partial:
+        yield partial
+
+
+def _ms_of_day(ts: bytes) -> Optional[int]:
+    """Millisecond-of-day of an ISO timestamp, tolerating missing sec/msec."""
+    try:
+        hh = int(ts[11:13])
+        mi = int(ts[14:16])
+        ss = int(ts[17:19]) if len(ts) >= 19 else 0
+        ms = int(ts[20:23]) if len(ts) >= 23 else 0
+        return ((hh * 60 + mi) * 60 + ss) * 1000 + ms
+    except ValueError:
+        return None
+
+
+def _extract_timestamp(line: bytes) -> Optional[bytes]:
+    """Extract the ISO timestamp from a raw log line, e.g. b'2026-02-17T16:48:38.784'.
+
+    The writer emits a fixed-width '[YYYY-MM-DDTHH:MM:SS.mmm]' prefix, so a
+    shape check plus a constant slice replaces the old regex.
+    """
+    if len(line) > 24 and line[0] == 0x5B and line[24] == 0x5D:  # '[' ... ']'
+        return line[1:24]
+    return None
+
+
+def _tail_candidates(port_dir: Path, lines: int) -> tuple[list[Path], list[Path]]:
+    """Split log files, newest first, into (likely enough, older spares).
+
+    The first list covers a *lines* tail assuming up to 256 bytes per line;
+    the second holds the remaining older files, read only if long lines make
+    the estimate fall short.
+    """
+    candidates: list[Path] = []
+    spares: list[Path] = []
+    budget = lines * 256
+    for _, lf in reversed(_list_log_dates(port_dir)):
+        try:
+            size = lf.stat().st_size
+        except OSError:
+            continue
+        if size == 0:
+            continue
+        if budget > 0:
+            candidates.append(lf)
+            budget -= size
+        else:
+            spares.append(lf)
+    return candidates, spares
 
 
 @app.get("/api/logs/{port_id}/tail")
@@ -94,20 +216,142 @@ async def tail_logs(port_id: str, lines: int = Query(500, ge=1, le=10000)):
     if not port_dir.exists():
         return {"lines": [], "total": 0}
 
-    log_files = sorted(port_dir.glob("*.log"), reverse=True)
+    # Listing and stat-ing also block on slow media: do it in a worker too
+    candidates, spares = await asyncio.to_thread(_tail_candidates, port_dir, lines)
+
+    # Tail the candidate files concurrently in worker threads; on slow eMMC
+    # this turns sum-of-latencies into max-of-latencies and keeps the event
+    # loop free.
+    chunks = await asyncio.gather(
+        *[asyncio.to_thread(_tail_lines, lf, lines) for lf in candidates]
+    )
+
     result: list[str] = []
     remaining = lines
+    for chunk in chunks:  # newest file first: prepend older chunks
+        if remaining <= 0:
+            break
+        chunk = chunk[-remaining:]
+        result = chunk + result
+        remaining -= len(chunk)
 
-    for lf in log_files:
+    # The size budget assumes <=256 bytes per line; when lines are longer the
+    # candidate set can fall short, so keep pulling from older files until
+    # the request is satisfied or the history is exhausted.
+    for lf in spares:
         if remaining <= 0:
             break
-        chunk = _tail_lines(lf, remaining)
+        chunk = await asyncio.to_thread(_tail_lines, lf, remaining)
+        chunk = chunk[-remaining:]
         result = chunk + result
         remaining -= len(chunk)
 
     return {"lines": result[-lines:], "total": len(result)}
 
 
+def _scan_logs(
+    port_dir: Path,
+    d_from: date,
+    d_to: date,
+    ts_from: Optional[bytes],
+    ts_to: Optional[bytes],
+    offset: int,
+    limit: int,
+    needle: Optional[bytes],
+):
+    """Blocking log scan yielding matching lines; driven from a worker thread."""
+    relevant = [(d, p) for d, p in _list_log_dates(port_dir) if d_from <= d <= d_to]
+
+    emitted = 0
+    skipped = 0
+    done = False
+    # The sparse line index can only short-cut `offset` when it counts raw
+    # lines, i.e. when no search/time filter drops lines before counting.
+    use_index = needle is None and ts_from is None and ts_to is None
+    ms_from = _ms_of_day(ts_from) if ts_from else None
+
+    for fdate, lf in relevant:
+        if lf.stat().st_size == 0:
+            continue
+
+        start_pos = 0
+        if use_index and skipped < offset:
+            try:
+                idx = LogIndex.load(lf)
+            except OSError:
+                idx = None
+            if idx is not None:
+                remaining = offset - skipped
+                if idx.total_lines <= remaining:
+                    # Entire file falls inside the skipped window.
+                    skipped += idx.total_lines
+                    continue
+                start_pos, pending = idx.seek_line(remaining)
+                skipped = offset - pending
+        elif ms_from is not None and fdate.isoformat().encode() == ts_from[:10]:
+            # Bisect into the first file of the window instead of scanning
+            # (and discarding) everything before datetime_from.
+            try:
+                start_pos = LogIndex.load(lf).seek_time(ms_from)
+            except OSError:
+                pass
+
+        with open(lf, "rb") as fh:
+            mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                if needle:
+                    # Lowercase the whole file once (a single C pass) instead
+                    # of allocating a lowered copy per line; lower() preserves
+                    # length, so offsets stay aligned with the raw map. The
+                    # ANSI-stripped probe is only for the whole-file skip,
+                    # since stripping shifts offsets.
+                    low = mm[:].lower()
+                    probe = ANSI_RE_B.sub(b"", low) if b"\x1b" in low else low
+                    if needle not in probe:
+                        continue
+                    pairs = zip(
+                        _iter_raw_lines(mm, start_pos),
+                        _iter_raw_lines(low, start_pos),
+                    )
+                else:
+                    pairs = ((raw, b"") for raw in _iter_raw_lines(mm, start_pos))
+
+                for raw, low_line in pairs:
+                    # Time-based filtering
+                    if ts_from or ts_to:
+                        line_ts = _extract_timestamp(raw)
+                        if line_ts:
+                            if ts_from and line_ts < ts_from:
+                                continue
+                            if ts_to and line_ts > ts_to:
+                                # Daily logs are chronological: nothing after
+                                # this point (or in later files) can match.
+                                done = True
+                                break
+
+                    if needle:
+                        # Check the raw (pre-lowered) line first; stripping
+                        # ANSI is only needed for the rare match that
+                        # straddles an escape sequence, so colored lines that
+                        # match directly skip the regex too.
+                        if needle not in low_line and (
+                            b"\x1b" not in low_line
+                            or needle not in ANSI_RE_B.sub(b"", low_line)
+                        ):
+                            continue
+                    if skipped < offset:
+                        skipped += 1
+                        continue
+                    yield raw.decode("utf-8", errors="replace")
+                    emitted += 1
+                    if emitted >= limit:
+                        break
+            finally:
+                mm.close()
+        if done or emitted >= limit:
+            break
+
+
 @app.get("/api/logs/{port_id}")
 async def get_logs(
     port_id: str,
@@ -120,8 +364,6 @@ async def get_logs(
     search: Optional[str] = Query(None),
 ):
     port_dir = Path(LOG_DIR) / port_id
-    if not port_dir.exists():
-        return {"lines": [], "has_more": False}
 
     # Determine date range for file selection
     if datetime_from:
@@ -138,52 +380,32 @@ async def get_logs(
     else:
         d_to = date.today()
 
-    # Prepare time-based filtering (ISO strings are lexicographically comparable)
-    ts_from = datetime_from.replace(" ", "T") if datetime_from else None
-    ts_to = datetime_to.replace(" ", "T") if datetime_to else None
-
-    log_files = sorted(port_dir.glob("*.log"))
-    relevant = []
-    for lf in log_files:
-        try:
-            fd = date.fromisoformat(lf.stem)
-            if d_from <= fd <= d_to:
-                relevant.append(lf)
-        except ValueError:
-            continue
-
-    lines: list[str] = []
-    skipped = 0
-    search_lower = search.lower() if search else None
-
-    for lf in relevant:
-        with open(lf, "r", encoding="utf-8", errors="replace") as fh:
-            for raw_line in fh:
-                line = raw_line.rstrip("\n")
-
-                # Time-based filtering
-                if ts_from or ts_to:
-                    line_ts = _extract_timestamp(line)
-                    if line_ts:
-                        if ts_from and line_ts < ts_from:
-                            continue
-                        if ts_to and line_ts > ts_to:
-                            continue
-
-                if search_lower:
-                    clean = ANSI_RE.sub("", line).lower()
-                    if search_lower not in clean:
-                        continue
-                if skipped < offset:
-                    skipped += 1
-                    continue
-                lines.append(line)
-                if len(lines) >= limit:
-                    break
-        if len(lines) >= limit:
-            break
-
-    return {"lines": lines, "has_more": len(lines) >= limit}
+    # Prepare time-based filtering (ISO strings are lexicographically
+    # comparable, and that holds for their UTF-8 bytes as well)
+    ts_from = datetime_from.replace(" ", "T").encode() if datetime_from else None
+    ts_to = datetime_to.replace(" ", "T").encode() if datetime_to else None
+    needle = search.encode("utf-8", errors="replace").lower() if search else None
+
+    def stream():
+        # NDJSON: one {"line": ...} object per match, then a {"has_more": ...}
+        # trailer. Starlette iterates this sync generator in a worker thread,
+        # so the event loop stays free and memory stays O(batch) in `limit`.
+        # Yield ~256 lines per chunk: each yield costs a thread-pool handoff
+        # and an ASGI send, which per-line would dominate small lines.
+        emitted = 0
+        chunk: list[bytes] = []
+        for line in _scan_logs(
+            port_dir, d_from, d_to, ts_from, ts_to, offset, limit, needle
+        ):
+            emitted += 1
+            chunk.append(orjson.dumps({"line": line}))
+            if len(chunk) >= 256:
+                yield b"\n".join(chunk) + b"\n"
+                chunk.clear()
+        chunk.append(orjson.dumps({"has_more": emitted >= limit}))
+        yield b"\n".join(chunk) + b"\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
 
 
 # --- Flash API ---
@@ -208,10 +430,14 @@ async def upload_pack(file: UploadFile = File(...)):
             content={"error": "Arquivo deve ser .pack"},
         )
     dest = Path(PACK_DIR) / file.filename
-    content = await file.read()
+    size = 0
     with open(dest, "wb") as f:
-        f.write(content)
-    return {"status": "ok", "filename": file.filename, "size": len(content)}
+        # Stream in 1 MiB chunks: .pack files reach ~18 MB and buffering the
+        # whole upload in RAM is wasteful on the Radxa.
+        while chunk := await file.read(1 << 20):
+            f.write(chunk)
+            size += len(chunk)
+    return {"status": "ok", "filename": file.filename, "size": size}
 
 
 @app.post("/api/flasher/flash/{port_id}")
@@ -230,38 +456,44 @@ async def flash_device(
     timings: list[str] = []
     t0 = _time.monotonic()
 
-    hex_path = f"/tmp/{hex_file.filename}"
-    content = await hex_file.read()
-    t_upload = _time.monotonic() - t0
-    timings.append(f"Upload recebido: {len(content)/1024:.1f} KB em {t_upload:.2f}s")
-
-    with open(hex_path, "wb") as f:
-        f.write(content)
-
-    t1 = _time.monotonic()
-    loop = asyncio.get_running_loop()
-    result = await loop.run_in_executor(
-        None,
-        lambda: flash_mgr.flash(
-            port_id=port_id,
-            hex_path=hex_path,
-            target=target if target else None,
-            frequency=frequency if frequency else None,
-        ),
-    )
-    t_flash = _time.monotonic() - t1
-    t_total = _time.monotonic() - t0
-    timings.append(f"pyocd flash: {t_flash:.2f}s")
-    timings.append(f"Total: {t_total:.2f}s")
-
-    result["timings"] = timings
-
+    # tempfile instead of /tmp/<filename>: the client-supplied name could
+    # collide across concurrent flashes (or traverse paths), and the file
+    # must not leak if the request dies mid-upload or mid-flash — hence the
+    # try/finally covers the streaming loop too.
+    tmp = tempfile.NamedTemporaryFile(suffix=".hex", delete=False)
+    hex_path = tmp.name
     try:
-        os.unlink(hex_path)
-    except OSError:
-        pass
+        with tmp:
+            size = 0
+            while chunk := await hex_file.read(1 << 20):
+                tmp.write(chunk)
+                size += len(chunk)
+        t_upload = _time.monotonic() - t0
+        timings.append(f"Upload recebido: {size/1024:.1f} KB em {t_upload:.2f}s")
+
+        t1 = _time.monotonic()
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(
+            None,
+            lambda: flash_mgr.flash(
+                port_id=port_id,
+                hex_path=hex_path,
+                target=target if target else None,
+                frequency=frequency if frequency else None,
+            ),
+        )
+        t_flash = _time.monotonic() - t1
+        t_total = _time.monotonic() - t0
+        timings.append(f"pyocd flash: {t_flash:.2f}s")
+        timings.append(f"Total: {t_total:.2f}s")
 
-    return result
+        result["timings"] = timings
+        return result
+    finally:
+        try:
+            os.unlink(hex_path)
+        except OSError:
+            pass
 
 
 # --- WebSocket ---
@@ -270,20 +502,44 @@ async def flash_device(
 @app.websocket("/api/ws/{port_id}")
 async def websocket_logs(websocket: WebSocket, port_id: str):
     await websocket.accept()
-    queue: asyncio.Queue = asyncio.Queue(maxsize=5000)
+    # Lines are buffered in a plain deque and the event loop is woken at most
+    # once per burst: one call_soon_threadsafe per batch instead of per line,
+    # and one WebSocket frame per drain instead of per line. When a slow
+    # client lets the buffer grow past WS_COALESCE_AT entries, the oldest
+    # run is joined into a single pre-batched entry instead of being dropped:
+    # the client sees compressed bursts, never holes.
+    buf: deque = deque()
+    buf_lock = threading.Lock()
+    ready = asyncio.Event()
     loop = asyncio.get_running_loop()
 
-    def on_line(line: str):
-        try:
-            loop.call_soon_threadsafe(queue.put_nowait, line)
-        except asyncio.QueueFull:
-            pass
+    def on_line(line: bytes):
+        with buf_lock:
+            buf.append(line)
+            if len(buf) >= WS_COALESCE_AT:
+                old = [buf.popleft() for _ in range(256)]
+                buf.appendleft(b"\n".join(old))
+        if not ready.is_set():
+            try:
+                loop.call_soon_threadsafe(ready.set)
+            except RuntimeError:
+                pass  # loop already closed
 
     manager.subscribe(port_id, on_line)
     try:
         while True:
-            line = await queue.get()
-            await websocket.send_text(line)
+            await ready.wait()
+            ready.clear()
+            while True:
+                with buf_lock:
+                    if not buf:
+                        break
+                    # Cap each frame at 512 lines so a long backlog does not
+                    # become one oversized WebSocket message.
+                    batch = [buf.popleft() for _ in range(min(len(buf), 512))]
+                # Entries arrive pre-encoded from the serial reader; binary
+                # frames forward them without a per-frame UTF-8 encode.
+                await websocket.send_bytes(b"\n".join(batch))
     except WebSocketDisconnect:
         pass
     finally:
@@ -1,4 +1,5 @@
 import os
+import queue
 import re
 import threading
 import time
@@ -9,6 +10,23 @@ from typing import Callable
 import serial
 import serial.tools.list_ports
 
+# Cache of the formatted current second, so per-line timestamping only has to
+# append the millisecond part instead of formatting a datetime every time.
+_TS_CACHE = {"sec": 0, "prefix": "", "date": ""}
+
+
+def _format_ts() -> tuple[str, str]:
+    """Return ('YYYY-MM-DDTHH:MM:SS.mmm', 'YYYY-MM-DD') for now, cheaply."""
+    now = time.time()
+    sec = int(now)
+    cache = _TS_CACHE
+    if sec != cache["sec"]:
+        dt = datetime.fromtimestamp(sec)
+        cache["prefix"] = dt.strftime("%Y-%m-%dT%H:%M:%S.")
+        cache["date"] = cache["prefix"][:10]
+        cache["sec"] = sec
+    return f"{cache['prefix']}{int((now - sec) * 1000):03d}", cache["date"]
+
 
 class SerialManager:
     """Discovers DAP serial devices, reads data, and writes daily log files."""
@@ -20,7 +38,10 @@ class SerialManager:
         self.log_dir.mkdir(parents=True, exist_ok=True)
         self.baud_rate = baud_rate
         self.ports: dict[str, dict] = {}
-        self.subscribers: dict[str, list[Callable]] = {}
+        # Copy-on-write: subscribe/unsubscribe rebuild the tuple under the
+        # lock; _notify reads it with a single lock-free dict lookup.
+        self.subscribers: dict[str, tuple[Callable, ...]] = {}
+        self._write_queues: dict[str, queue.SimpleQueue] = {}
         self._running = False
         self._lock = threading.Lock()
         self._pause_flags: dict[str, bool] = {}
@@ -71,29 +92,26 @@ class SerialManager:
 
     def subscribe(self, port_id: str, callback: Callable):
         with self._lock:
-            self.subscribers.setdefault(port_id, []).append(callback)
+            self.subscribers[port_id] = self.subscribers.get(port_id, ()) + (callback,)
 
     def unsubscribe(self, port_id: str, callback: Callable):
         with self._lock:
-            if port_id in self.subscribers:
-                try:
-                    self.subscribers[port_id].remove(callback)
-                except ValueError:
-                    pass
+            current = self.subscribers.get(port_id, ())
+            if callback in current:
+                self.subscribers[port_id] = tuple(
+                    cb for cb in current if cb is not callback
+                )
 
-    def _notify(self, port_id: str, line: str):
-        with self._lock:
-            callbacks = list(self.subscribers.get(port_id, []))
-        for cb in callbacks:
+    def _notify(self, port_id: str, line: bytes):
+        # Lock-free hot path: dict reads are atomic under the GIL and the
+        # tuple snapshot is immutable, so no per-line copy is needed.
+        for cb in self.subscribers.get(port_id, ()):
             try:
                 cb(line)
             except Exception:
                 pass
 
     def _read_serial(self, port_id: str):
-        port_log_dir = self.log_dir / port_id
-        port_log_dir.mkdir(parents=True, exist_ok=True)
-
         while self._running:
             # Handle pause (e.g. during firmware flash)
             with self._lock:
@@ -107,7 +125,7 @@ class SerialManager:
                 ts = datetime.now().isoformat(timespec="milliseconds")
                 self._notify(
                     port_id,
-                    f"[{ts}] \x1b[93m--- Serial pausada (flash em andamento) ---\x1b[0m",
+                    f"[{ts}] \x1b[93m--- Serial pausada (flash em andamento) ---\x1b[0m".encode(),
                 )
                 while self._running:
                     with self._lock:
@@ -117,13 +135,12 @@ class SerialManager:
                 ts = datetime.now().isoformat(timespec="milliseconds")
                 self._notify(
                     port_id,
-                    f"[{ts}] \x1b[92m--- Serial retomada ---\x1b[0m",
+                    f"[{ts}] \x1b[92m--- Serial retomada ---\x1b[0m".encode(),
                 )
                 continue
 
             device = self.ports[port_id]["device"]
             ser = None
-            log_fh = None
             try:
                 if not os.path.exists(device):
                     with self._lock:
@@ -131,19 +148,19 @@ class SerialManager:
                     time.sleep(2)
                     continue
 
-                ser = serial.Serial(device, self.baud_rate, timeout=0.05)
+                ser = serial.Serial(device, self.baud_rate, timeout=0.2)
                 with self._lock:
                     self.ports[port_id]["connected"] = True
 
                 ts = datetime.now().isoformat(timespec="milliseconds")
                 self._notify(
                     port_id,
-                    f"[{ts}] \x1b[92m--- Conectado em {device} ---\x1b[0m",
+                    f"[{ts}] \x1b[92m--- Conectado em {device} ---\x1b[0m".encode(),
                 )
 
                 buf = bytearray()
-                current_date = ""
-                last_flush = time.monotonic()
+                read_pos = 0
+                write_q = self._write_queues[port_id]
 
                 while self._running:
                     # Break if paused (flash request)
@@ -151,49 +168,42 @@ class SerialManager:
                         if self._pause_flags.get(port_id, False):
                             break
 
-                    # Read all available bytes at once (bulk read)
-                    waiting = ser.in_waiting
-                    if waiting > 0:
-                        buf.extend(ser.read(waiting))
-                    else:
-                        byte = ser.read(1)
-                        if byte:
-                            buf.extend(byte)
+                    # One read per iteration: everything pending up to 64 KiB,
+                    # or block (up to the 0.2s timeout) for the next byte when
+                    # idle. Far fewer syscalls than the old 1-byte fallback.
+                    chunk = ser.read(max(1, min(ser.in_waiting, 65536)))
+                    if chunk:
+                        buf.extend(chunk)
 
-                    # Process all complete lines in the buffer
+                    # Process all complete lines in the buffer. A read cursor
+                    # avoids the O(n) memmove of `del buf[:idx+1]` per line;
+                    # the consumed prefix is compacted away only occasionally.
                     entries_to_notify = []
-                    while b"\n" in buf:
-                        idx = buf.index(b"\n")
-                        raw_line = bytes(buf[:idx])
-                        del buf[:idx + 1]
+                    nl = buf.find(b"\n", read_pos)
+                    while nl != -1:
+                        raw_line = bytes(memoryview(buf)[read_pos:nl])
+                        read_pos = nl + 1
+                        nl = buf.find(b"\n", read_pos)
 
                         line = raw_line.decode("latin-1").rstrip("\r")
                         if not line:
                             continue
 
-                        ts = datetime.now().isoformat(timespec="milliseconds")
-                        log_entry = f"[{ts}] {line}"
-
-                        # Rotate log file daily
-                        today = datetime.now().strftime("%Y-%m-%d")
-                        if today != current_date:
-                            if log_fh:
-                                log_fh.flush()
-                                log_fh.close()
-                            log_file = port_log_dir / f"{today}.log"
-                            log_fh = open(log_file, "a", encoding="utf-8")
-                            current_date = today
-
-                        log_fh.write(log_entry + "\n")
-                        entries_to_notify.append(log_entry)
-
-                    # Flush to disk periodically (every 0.5s) instead of per-line
-                    now = time.monotonic()
-                    if log_fh and (now - last_flush) >= 0.5:
-                        log_fh.flush()
-                        last_flush = now
-
-                    # Notify subscribers AFTER all I/O is done
+                        ts, _ = _format_ts()
+                        # Encode once; the writer thread and every subscriber
+                        # (WebSocket frames included) reuse the same bytes.
+                        entry = f"[{ts}] {line}".encode("utf-8", "replace")
+
+                        # Disk I/O happens in the per-port writer thread, so
+                        # slow storage never stalls the read loop.
+                        write_q.put(entry)
+                        entries_to_notify.append(entry)
+
+                    if read_pos and (read_pos > 32768 or read_pos > len(buf) // 2):
+                        del buf[:read_pos]
+                        read_pos = 0
+
+                    # Notify subscribers AFTER the lines are queued
                     for entry in entries_to_notify:
                         self._notify(port_id, entry)
 
@@ -206,18 +216,76 @@ class SerialManager:
                     self.ports[port_id]["connected"] = False
                 time.sleep(5)
             finally:
-                if log_fh:
-                    try:
-                        log_fh.flush()
-                        log_fh.close()
-                    except Exception:
-                        pass
                 if ser:
                     try:
                         ser.close()
                     except Exception:
                         pass
 
+    def _writer_loop(self, port_id: str):
+        """Drain queued log entries and write them to disk in large batches.
+
+        Entries are accumulated until ~64 KiB or 500 ms have passed, then
+        written with a single write call. Daily rotation keys off each
+        entry's own timestamp prefix, so lines straddling midnight land in
+        the right file. A ``None`` sentinel shuts the thread down.
+        """
+        q = self._write_queues[port_id]
+        port_log_dir = self.log_dir / port_id
+        port_log_dir.mkdir(parents=True, exist_ok=True)
+        log_fh = None
+        current_date = b""
+
+        running = True
+        while running:
+            entry = q.get()
+            if entry is None:
+                break
+            batch = [entry]
+            size = len(entry)
+            deadline = time.monotonic() + 0.5
+            while size < 65536:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    entry = q.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if entry is None:
+                    running = False
+                    break
+                batch.append(entry)
+                size += len(entry)
+
+            try:
+                # Write runs of same-day entries in one call each
+                i = 0
+                n = len(batch)
+                while i < n:
+                    day = batch[i][1:11]
+                    j = i
+                    while j < n and batch[j][1:11] == day:
+                        j += 1
+                    if day != current_date:
+                        if log_fh:
+                            log_fh.close()
+                        log_fh = open(port_log_dir / f"{day.decode()}.log", "ab")
+                        current_date = day
+                    log_fh.write(b"\n".join(batch[i:j]) + b"\n")
+                    i = j
+                if log_fh:
+                    log_fh.flush()
+            except OSError:
+                time.sleep(1)
+
+        if log_fh:
+            try:
+                log_fh.flush()
+                log_fh.close()
+            except Exception:
+                pass
+
     def _discover_and_start(self):
         dap_ports = self.discover_dap_ports()
         for p in dap_ports:
@@ -236,11 +304,14 @@ class SerialManager:
                     "serial_number": p.serial_number or "",
                     "connected": False,
                 }
+                self._write_queues[port_id] = queue.SimpleQueue()
 
-            t = threading.Thread(
+            threading.Thread(
+                target=self._writer_loop, args=(port_id,), daemon=True
+            ).start()
+            threading.Thread(
                 target=self._read_serial, args=(port_id,), daemon=True
-            )
-            t.start()
+            ).start()
 
     def _discovery_loop(self):
         while self._running:
@@ -257,3 +328,6 @@ class SerialManager:
 
     def stop(self):
         self._running = False
+        # Wake the writer threads so they flush and exit promptly
+        for q in self._write_queues.values():
+            q.put(None)
@@ -1,50 +1,116 @@
+import mmap
 import re
 import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from datetime import datetime, timedelta
 from pathlib import Path
 
 # Configuração: ajuste de horas (ex: UTC para Brasília é -3)
-HOURS_ADJUST = -3 
+HOURS_ADJUST = -3
 LOG_BASE_DIR = Path("/mnt/external_sd/logs")
 
-def adjust_line(line):
-    # Regex para encontrar o timestamp: [2026-02-19T04:56:00.677]
-    # Aceita tanto T quanto espaço como separador
-    match = re.match(r'^\[(\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}\.\d{3})\](.*)', line)
-    if match:
-        ts_str, rest = match.groups()
-        try:
-            # Normaliza para ISO (com T) para o datetime
-            ts_iso = ts_str.replace(' ', 'T')
-            dt = datetime.fromisoformat(ts_iso)
-            dt_new = dt + timedelta(hours=HOURS_ADJUST)
-            
-            # Mantém o formato original (se era espaço, mantém espaço)
-            sep = ' ' if ' ' in ts_str else 'T'
-            new_ts = dt_new.isoformat(timespec='milliseconds').replace('T', sep)
-            
-            return f"[{new_ts}]{rest}\n"
-        except ValueError:
-            return line + "\n"
-    return line + "\n"
+# timedelta construido uma unica vez (usado so na virada de dia)
+_SHIFT = timedelta(hours=HOURS_ADJUST)
+
+# Regex para encontrar o timestamp: [2026-02-19T04:56:00.677]
+# Aceita tanto T quanto espaço como separador; compilada uma unica vez
+# no import (evita o hash/lookup do cache interno do re a cada linha).
+# Padrao em bytes: o arquivo e processado em modo binario, sem pagar
+# decode UTF-8 + encode do arquivo inteiro so para inspecionar ASCII.
+# Os campos sao validados por faixa (mes 01-12, dia 01-31, hora 00-23,
+# min/seg 00-59) direto na regex, entao o parse nunca falha e o shift
+# dispensa o try/except ValueError especulativo.
+_TS_RE = re.compile(
+    rb'^\[(\d{4}-(?:0[1-9]|1[0-2])-(?:0[1-9]|[12]\d|3[01]))'
+    rb'([T ])'
+    rb'((?:[01]\d|2[0-3]):[0-5]\d:[0-5]\d\.\d{3})\]'
+)
+
+@lru_cache(maxsize=4096)
+def _shift_ts(date_b, sep, time_b):
+    """Timestamp ajustado ('YYYY-MM-DD<sep>HH:MM:SS.mmm' em bytes).
+
+    Funcao pura dos tres grupos capturados, entao o lru_cache colapsa as
+    rajadas de linhas com o mesmo timestamp num unico calculo.
+    """
+    # Caminho rapido: o ajuste e um numero inteiro de horas, entao na
+    # maioria das linhas basta reescrever os dois digitos da hora —
+    # sem criar datetime/timedelta. So cai no datetime quando a hora
+    # estoura o dia (virada de data).
+    hh = int(time_b[0:2]) + HOURS_ADJUST
+    if 0 <= hh <= 23:
+        return b'%s%s%02d%s' % (date_b, sep, hh, time_b[2:])
+
+    dt = datetime.fromisoformat(f"{date_b.decode()}T{time_b.decode()}")
+    dt_new = dt + _SHIFT
+
+    # O ajuste e de horas inteiras: minutos/segundos/ms nao mudam,
+    # entao reaproveita o sufixo original e formata so data e hora
+    # (mantendo o separador original) — sem isoformat nem replace
+    return b'%04d-%02d-%02d%s%02d%s' % (
+        dt_new.year, dt_new.month, dt_new.day, sep, dt_new.hour, time_b[2:]
+    )
+
+def _iter_logs(root):
+    """Gera Paths de todos os .log abaixo de root (recursivo, via scandir).
+
+    Um readdir por diretorio, sem o fnmatch nem os objetos intermediarios
+    do glob('**/*.log'); backups .log.bak ja ficam de fora.
+    """
+    with os.scandir(root) as it:
+        for e in it:
+            if e.is_dir(follow_symlinks=False):
+                yield from _iter_logs(e.path)
+            elif e.name.endswith('.log'):
+                yield Path(e.path)
 
 def process_file(file_path):
     print(f"Processando: {file_path}")
     try:
-        # Lê o conteúdo
-        content = file_path.read_text(encoding='utf-8', errors='replace')
-        lines = content.splitlines()
-        
-        # Ajusta as linhas
-        new_lines = [adjust_line(l) for l in lines]
-        
-        # Cria backup
+        # Guarda de idempotencia: o .bak marca arquivo ja corrigido.
+        # Rodar de novo pularia em O(1) em vez de deslocar duas vezes.
         backup_path = file_path.with_suffix('.log.bak')
-        file_path.rename(backup_path)
+        if backup_path.exists():
+            print(f"  Ja processado ({backup_path.name} existe), ignorado.")
+            return
+
+        if file_path.stat().st_size == 0:
+            print(f"  Arquivo vazio, ignorado.")
+            return
+
+        # Backup por copia; o original e corrigido no lugar
+        shutil.copyfile(file_path, backup_path)
         print(f"  Backup criado: {backup_path.name}")
-        
-        # Escreve o novo arquivo
-        file_path.write_text("".join(new_lines), encoding='utf-8')
+
+        # O timestamp ajustado ocupa exatamente os mesmos 23 bytes do
+        # original (largura fixa, mesmo na virada de data), entao a
+        # correcao e feita in-place via mmap: so os bytes do timestamp
+        # sao regravados e o resto do arquivo nunca e copiado.
+        with open(file_path, 'r+b') as f:
+            with mmap.mmap(f.fileno(), 0) as mm:
+                # Bind locais do loop quente: LOAD_FAST em vez de lookup
+                # global/atributo a cada linha
+                ts_match = _TS_RE.match
+                shift_ts = _shift_ts
+                find = mm.find
+                n = len(mm)
+                pos = 0
+                while 0 <= pos < n:
+                    # Prefiltro barato: linhas sem o esqueleto
+                    # "[...23 bytes...]" nem entram no motor de regex
+                    if mm[pos] == 0x5B and pos + 25 <= n and mm[pos + 24] == 0x5D:
+                        match = ts_match(mm[pos:pos + 25])
+                        if match:
+                            mm[pos + 1:pos + 24] = shift_ts(
+                                match[1], match[2], match[3]
+                            )
+                    nl = find(b'\n', pos)
+                    if nl == -1:
+                        break
+                    pos = nl + 1
+                mm.flush()
         print(f"  Arquivo atualizado com sucesso.")
     except Exception as e:
         print(f"  Erro ao processar {file_path.name}: {e}")
@@ -54,17 +120,15 @@ if __name__ == "__main__":
         print(f"Erro: Diretorio {LOG_BASE_DIR} nao encontrado!")
         exit(1)
 
-    log_files = list(LOG_BASE_DIR.glob("**/*.log"))
+    log_files = list(_iter_logs(LOG_BASE_DIR))
     if not log_files:
         print("Nenhum arquivo .log encontrado.")
         exit(0)
 
     print(f"Encontrados {len(log_files)} arquivos. Iniciando ajuste de {HOURS_ADJUST} horas...")
-    
-    for log_file in log_files:
-        # Pula arquivos que já são backups
-        if log_file.suffix == '.bak':
-            continue
-        process_file(log_file)
+
+    # Cada arquivo e independente: processa em paralelo, um worker por core
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as ex:
+        list(ex.map(process_file, log_files))
 
     print("\nConcluido!")